@@ -18,6 +18,7 @@ TEMPLATE_DIR="${BASE_DIR}/templates"
 CONF_TOP_DIR="${BASE_DIR}/config-top.d"
 CONF_BOT_DIR="${BASE_DIR}/config-bottom.d"
 LOG_FILE="${BASE_DIR}/history.log"
+LOCK_DIR="${BASE_DIR}/.locks"
 
 # Default Verbosity
 VERBOSE=0
@@ -57,10 +58,95 @@ log_event() {
     if [ ! -f "$LOG_FILE" ]; then
         touch "$LOG_FILE" && chmod 600 "$LOG_FILE"
     fi
-    echo "$TS|$USER|$ACTION|$TARGET|$DETAILS" >> "$LOG_FILE"
+    if command -v flock >/dev/null; then
+        { flock -x 9; echo "$TS|$USER|$ACTION|$TARGET|$DETAILS" >&9; } 9>> "$LOG_FILE"
+    else
+        echo "$TS|$USER|$ACTION|$TARGET|$DETAILS" >> "$LOG_FILE"
+    fi
     debug "Logged event: $ACTION $TARGET"
 }
 
+# Replace FILE with stdin via a temp file + rename, so readers never see a partial file.
+atomic_write() {
+    local FILE="$1"
+    local MODE="$2"
+    local TMP
+    TMP=$(mktemp "$FILE.XXXXXX")
+    cat > "$TMP"
+    chmod "$MODE" "$TMP"
+    mv -f "$TMP" "$FILE"
+}
+
+# --- Locking ---
+# Commands that modify one identity or template hold the store lock shared plus
+# that identity's/template's own lock, so independent hosts run concurrently.
+# Layout-wide operations (backup, restore, import) hold the store lock exclusively.
+# Locks are released when the process exits (or by release_locks).
+# LOCK_FDS is exported (space-separated) so workers started by run_parallel know
+# which of their inherited descriptors are locks; see without_locks.
+export LOCK_FDS="${LOCK_FDS:-}"
+STORE_LOCK_HELD=""
+
+acquire_lock() {
+    local FILE="$1"
+    local MODE="$2"
+    local FD
+    if ! command -v flock >/dev/null; then
+        debug "flock not available, running without lock $(basename "$FILE")"
+        return 0
+    fi
+    mkdir -p -m 700 "$LOCK_DIR"
+    exec {FD}>> "$FILE"
+    if ! flock -n "$MODE" "$FD"; then
+        info "Waiting for lock $(basename "$FILE" .lock)..."
+        flock "$MODE" "$FD"
+    fi
+    LOCK_FDS="${LOCK_FDS:+$LOCK_FDS }$FD"
+    debug "Acquired lock $(basename "$FILE") ($MODE)"
+}
+
+release_locks() {
+    local FD
+    for FD in $LOCK_FDS; do
+        { exec {FD}>&-; } 2>/dev/null || true
+    done
+    LOCK_FDS=""
+    STORE_LOCK_HELD=""
+}
+
+# Runs a command without the lock descriptors. Bash cannot mark them close-on-exec,
+# so anything long-lived a child leaves behind (an ssh ControlMaster started with
+# ControlPersist) would otherwise hold the locks and block backup/restore/import.
+without_locks() {
+    (
+        for FD in $LOCK_FDS; do
+            { exec {FD}>&-; } 2>/dev/null || true
+        done
+        exec "$@"
+    )
+}
+
+ssh() { without_locks ssh "$@"; }
+ssh-copy-id() { without_locks ssh-copy-id "$@"; }
+
+lock_store() {
+    local MODE="${1:--s}"
+    if [ -n "$STORE_LOCK_HELD" ]; then return 0; fi
+    acquire_lock "$LOCK_DIR/store.lock" "$MODE"
+    STORE_LOCK_HELD="$MODE"
+}
+
+lock_identity() {
+    lock_store -s
+    acquire_lock "$LOCK_DIR/host-${1//\//_}.lock" -x
+}
+
+# Shared for commands that only link to the template, exclusive (default) for changes.
+lock_template() {
+    lock_store -s
+    acquire_lock "$LOCK_DIR/template-${1//\//_}.lock" "${2:--x}"
+}
+
 ensure_base_dirs() {
     mkdir -p -m 700 "$BASE_DIR" "$UUID_DIR" "$KEY_DIR" "$HOST_DIR" "$TEMPLATE_DIR" "$CONF_TOP_DIR" "$CONF_BOT_DIR"
     if [ ! -f "$LOG_FILE" ]; then
@@ -80,6 +166,85 @@ get_uuid_path_from_host() {
     echo "$REAL_PATH"
 }
 
+get_host_alias_from_uuid() {
+    local UUID="$1"
+    local LINK
+    for LINK in "$HOST_DIR"/*; do
+        [ -L "$LINK" ] || continue
+        if [ "$(basename "$(cd "$HOST_DIR" && readlink -f "$LINK")")" == "$UUID" ]; then
+            basename "$LINK"
+            return 0
+        fi
+    done
+    return 1
+}
+
+# Appends "/<alias>" (or "/-") to every "<uuid>/<user>" line on stdin, reading the
+# by-host links once instead of once per identity like get_host_alias_from_uuid.
+add_host_aliases() {
+    awk 'NR == FNR { if (!($1 in a)) a[$1] = $2; next }
+         { split($0, p, "/"); print $0 "/" ((p[1] in a) ? a[p[1]] : "-") }' <(
+        local LINK TARGET
+        for LINK in "$HOST_DIR"/*; do
+            [ -L "$LINK" ] || continue
+            TARGET=$(readlink "$LINK")
+            TARGET="${TARGET%/}"
+            echo "${TARGET##*/} ${LINK##*/}"
+        done
+    ) -
+}
+
+# Refresh the fingerprint lookup index for the given identity/template dirs (all if none).
+update_key_index() {
+    local LIB_DIR
+    LIB_DIR="$(dirname "$(dirname "$(readlink -f "$0")")")/lib"
+    if command -v python3 >/dev/null && [ -f "$LIB_DIR/ssh-lookup.py" ]; then
+        python3 "$LIB_DIR/ssh-lookup.py" --update "$@" 2>/dev/null || warn "Could not update key index."
+    else
+        debug "Key index not updated (python3 or ssh-lookup.py missing)."
+    fi
+}
+
+# --- Template Functions ---
+validate_template() {
+    local NAME="$1"
+    if [[ ! "$NAME" =~ ^[a-zA-Z0-9._-]+$ ]]; then err "Invalid template name '$NAME'."; fi
+    if [ ! -d "$TEMPLATE_DIR/$NAME" ]; then err "Template '$NAME' not found."; fi
+}
+
+validate_key_type() {
+    case "$1" in
+        ed25519|ecdsa|rsa) ;;
+        *) err "Invalid key type '$1' (expected ed25519, ecdsa or rsa)." ;;
+    esac
+}
+
+# Prints "<uuid>/<user>" for every identity whose key is linked to the template
+# (optionally restricted to one key type).
+get_identities_using_template() {
+    local NAME="$1"
+    local TYPE="${2:-}"
+    local KEY TARGET USER_DIR
+    for KEY in "$UUID_DIR"/*/*/identity; do
+        [ -L "$KEY" ] || continue
+        TARGET=$(readlink "$KEY")
+        case "$TARGET" in
+            */templates/"$NAME"/id_*) [ -z "$TYPE" ] || [ "$(basename "$TARGET")" == "id_$TYPE" ] || continue ;;
+            */templates/"$NAME"/identity) [ -z "$TYPE" ] || continue ;;
+            *) continue ;;
+        esac
+        USER_DIR=$(dirname "$KEY")
+        echo "$(basename "$(dirname "$USER_DIR")")/$(basename "$USER_DIR")"
+    done
+}
+
+# Runs "<cmd...> <item>" for every item on stdin, at most JOBS at a time.
+run_parallel() {
+    local JOBS="$1"
+    shift
+    xargs -P "$JOBS" -n 1 "$@"
+}
+
 # --- Scan & Auth Functions ---
 get_full_host_scan() {
     local DATA
@@ -89,10 +254,15 @@ get_full_host_scan() {
     echo "$DATA"
 }
 
+# The host key the identity UUID is derived from (ed25519, else ecdsa, else rsa).
+get_best_key_from_scan_data() {
+    echo "$1" | awk '/ssh-ed25519/{k=$3} /ecdsa/{if(!k)k=$3} /ssh-rsa/{if(!k)k=$3} END{print k}'
+}
+
 get_host_uuid_from_scan_data() {
     local DATA="$1"
     local BEST_KEY
-    BEST_KEY=$(echo "$DATA" | awk '/ssh-ed25519/{k=$3} /ecdsa/{if(!k)k=$3} /ssh-rsa/{if(!k)k=$3} END{print k}')
+    BEST_KEY=$(get_best_key_from_scan_data "$DATA")
     if [ -z "$BEST_KEY" ]; then err "No usable key found in scan data."; fi
     
     local HASH
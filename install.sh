@@ -104,12 +104,12 @@ do_install() {
     find "$SOURCE_DIR" -maxdepth 1 -type f -not -name '.*' -exec cp -f {} "$INSTALL_LIB/" \;
     chmod +x "$INSTALL_LIB"/*
 
-    # Copy lib/ assets (ssh-ui.py, requirements-ui.txt, ui/*)
+    # Copy lib/ assets (ssh-ui.py and helpers, requirements-ui.txt, ui/*)
     LIB_SRC_DIR="$(dirname "$SOURCE_DIR")/lib"
     LIB_DEST_DIR="$(dirname "$INSTALL_LIB")/lib"
     msg "Installing lib assets to $LIB_DEST_DIR..."
     mkdir -p "$LIB_DEST_DIR"
-    cp -f "$LIB_SRC_DIR/ssh-ui.py" "$LIB_DEST_DIR/"
+    cp -f "$LIB_SRC_DIR"/*.py "$LIB_DEST_DIR/"
     cp -f "$LIB_SRC_DIR/requirements-ui.txt" "$LIB_DEST_DIR/"
 
     UI_SRC_DIR="$LIB_SRC_DIR/ui"
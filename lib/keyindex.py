@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Reverse lookup index: OpenSSH SHA256 fingerprint -> owning identity, user or template.
+
+The index is a flat file of pipe-separated records (like history.log):
+
+    SOURCE|KIND|FINGERPRINT|BLOB|UUID|USER|TEMPLATE|KEYFILE
+
+SOURCE is the store directory a record was derived from (host-uuid/<uuid> or
+templates/<name>), so a change to one identity or template only rescans that
+directory. KIND is one of host, alias, user, user-retired, link, template or
+template-retired; link records tie a user to the template key it uses, which
+keeps template rotations from touching every linked identity's records.
+"""
+import os
+import base64
+import hashlib
+
+import sshuk
+
+INDEX_FILE = os.path.join(sshuk.BASE_DIR, "key-index")
+KEY_PREFIXES = ('ssh-', 'ecdsa-', 'sk-')
+
+def fingerprint(blob):
+    """OpenSSH "SHA256:..." fingerprint of a base64 key blob, or None if it is not base64."""
+    try:
+        raw = base64.b64decode(blob, validate=True)
+    except ValueError:
+        return None
+    return "SHA256:" + base64.b64encode(hashlib.sha256(raw).digest()).decode().rstrip('=')
+
+def parse_key_line(line):
+    """(type, blob) from an authorized_keys/known_hosts/.pub style line, or None.
+
+    The blob must look like a key, so a host column such as "ssh-gw.example.com"
+    is not mistaken for the key type.
+    """
+    parts = line.split()
+    for i, p in enumerate(parts[:-1]):
+        if p.startswith(KEY_PREFIXES) and parts[i + 1].startswith('AAAA') and fingerprint(parts[i + 1]):
+            return p, parts[i + 1]
+    return None
+
+def _read_keys(path):
+    keys = []
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'): continue
+                parsed = parse_key_line(line)
+                if parsed: keys.append(parsed)
+    except OSError: pass
+    return keys
+
+def _key_record(source, kind, blob, uuid='', user='', template='', keyfile=''):
+    fp = fingerprint(blob)
+    if not fp: return None
+    return (source, kind, fp, blob, uuid, user, template, keyfile)
+
+def _aliases_by_uuid():
+    aliases = {}
+    if os.path.isdir(sshuk.HOST_DIR):
+        for host in os.listdir(sshuk.HOST_DIR):
+            path = os.path.join(sshuk.HOST_DIR, host)
+            if os.path.islink(path):
+                aliases.setdefault(os.path.basename(os.path.realpath(path)), []).append(host)
+    return aliases
+
+def scan_identity(uuid, aliases):
+    source = f"host-uuid/{uuid}"
+    uuid_path = os.path.join(sshuk.UUID_DIR, uuid)
+    records = []
+    if not os.path.isdir(uuid_path): return records
+    for ktype, blob in _read_keys(os.path.join(uuid_path, "known_host_keys")):
+        records.append(_key_record(source, 'host', blob, uuid))
+    for host in sorted(aliases.get(uuid, [])):
+        records.append((source, 'alias', '', '', uuid, host, '', ''))
+    for user in os.listdir(uuid_path):
+        user_path = os.path.join(uuid_path, user)
+        if os.path.islink(user_path) or not os.path.isdir(user_path): continue
+        identity = os.path.join(user_path, "identity")
+        target = os.readlink(identity) if os.path.islink(identity) else ''
+        if "templates/" in target:
+            parts = target.split('/')
+            template = parts[parts.index("templates") + 1]
+            records.append((source, 'link', '', '', uuid, user, template, parts[-1]))
+        else:
+            for ktype, blob in _read_keys(identity + ".pub"):
+                records.append(_key_record(source, 'user', blob, uuid, user))
+        for ktype, blob in _read_keys(os.path.join(user_path, "previous_keys")):
+            records.append(_key_record(source, 'user-retired', blob, uuid, user))
+    return [r for r in records if r]
+
+def scan_template(name):
+    source = f"templates/{name}"
+    template_path = os.path.join(sshuk.SSH_TEMPLATE_DIR, name)
+    records = []
+    if not os.path.isdir(template_path): return records
+    for f in os.listdir(template_path):
+        if f.endswith('.pub') and (f.startswith('id_') or f == 'identity.pub'):
+            for ktype, blob in _read_keys(os.path.join(template_path, f)):
+                records.append(_key_record(source, 'template', blob, template=name, keyfile=f[:-4]))
+    for ktype, blob in _read_keys(os.path.join(template_path, "previous_keys")):
+        records.append(_key_record(source, 'template-retired', blob, template=name))
+    return [r for r in records if r]
+
+def _scan_source(source, aliases):
+    kind, _, name = source.partition('/')
+    if kind == 'host-uuid': return scan_identity(name, aliases)
+    if kind == 'templates': return scan_template(name)
+    return []
+
+def _all_sources():
+    sources = []
+    for base, prefix in ((sshuk.UUID_DIR, 'host-uuid'), (sshuk.SSH_TEMPLATE_DIR, 'templates')):
+        if os.path.isdir(base):
+            sources.extend(f"{prefix}/{name}" for name in os.listdir(base))
+    return sources
+
+def source_for_path(path):
+    """host-uuid/<uuid> or templates/<name> for a path inside the store, else None."""
+    rel = os.path.relpath(os.path.abspath(path), sshuk.BASE_DIR).split(os.sep)
+    if len(rel) >= 2 and rel[0] in ('host-uuid', 'templates'): return f"{rel[0]}/{rel[1]}"
+    return None
+
+def load_records():
+    records = []
+    if os.path.exists(INDEX_FILE):
+        with open(INDEX_FILE, 'r') as f:
+            for line in f:
+                parts = line.rstrip('\n').split('|')
+                if len(parts) == 8: records.append(tuple(parts))
+    return records
+
+def update(paths=None):
+    """Rescan the given identity/template directories (all of them if None) and rewrite the index."""
+    with sshuk.index_lock():
+        aliases = _aliases_by_uuid()
+        if paths is None:
+            sources = set(_all_sources())
+            records = []
+        else:
+            sources = {s for s in (source_for_path(p) for p in paths) if s}
+            records = [r for r in load_records() if r[0] not in sources]
+        for source in sorted(sources):
+            records.extend(_scan_source(source, aliases))
+        if os.path.isdir(sshuk.BASE_DIR):
+            sshuk.atomic_write(INDEX_FILE, ''.join('|'.join(r) + '\n' for r in records), 0o600)
+        return len(sources), len(records)
+
+class KeyIndex:
+    """In-memory view of the index file for constant-time lookups."""
+
+    def __init__(self):
+        self.mtime = None
+        self.by_fp = {}
+        self.fp_by_key = {}
+        self.links = {}
+        self.aliases = {}
+
+    def load(self):
+        by_fp, fp_by_key, links, aliases = {}, {}, {}, {}
+        for source, kind, fp, blob, uuid, user, template, keyfile in load_records():
+            if kind == 'alias': aliases.setdefault(uuid, []).append(user)
+            elif kind == 'link': links.setdefault(template, []).append((uuid, user, keyfile))
+            else:
+                by_fp.setdefault(fp, []).append({'kind': kind, 'fingerprint': fp, 'key': blob, 'uuid': uuid,
+                                                 'user': user, 'template': template, 'keyfile': keyfile})
+                fp_by_key[blob] = fp
+        self.by_fp, self.fp_by_key, self.links, self.aliases = by_fp, fp_by_key, links, aliases
+        self.mtime = os.path.getmtime(INDEX_FILE) if os.path.exists(INDEX_FILE) else None
+        return self
+
+    def refresh(self):
+        """Reload if the index file changed since the last load."""
+        current = os.path.getmtime(INDEX_FILE) if os.path.exists(INDEX_FILE) else None
+        if current != self.mtime: self.load()
+        return self
+
+    def lookup(self, query):
+        """Matches for a fingerprint, public key line, key blob or log line containing one."""
+        fp = normalize_query(query)
+        results = []
+        for entry in self.by_fp.get(fp, []):
+            entry = dict(entry, aliases=self.aliases.get(entry['uuid'], []))
+            if entry['kind'] == 'template':
+                entry['users'] = [{'uuid': u, 'user': user, 'aliases': self.aliases.get(u, [])}
+                                  for u, user, keyfile in self.links.get(entry['template'], []) if keyfile == entry['keyfile']]
+            results.append(entry)
+        return fp, results
+
+    def fingerprint(self, blob):
+        """Fingerprint of a key blob, from the index when it is known."""
+        return self.fp_by_key.get(blob) or fingerprint(blob)
+
+def normalize_query(query):
+    """Reduce a query to a "SHA256:..." fingerprint."""
+    query = query.strip()
+    for token in query.replace(',', ' ').split():
+        if token.startswith('SHA256:'): return token
+    parsed = parse_key_line(query)
+    if parsed: return fingerprint(parsed[1]) or query
+    if query.startswith('AAAA'): return fingerprint(query) or query
+    return "SHA256:" + query.rstrip('=')
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""Bulk import of existing known_hosts / ssh_config inventories into the key store.
+
+Builds the same host-uuid, by-host and by-key layout that ssh-new creates, but
+from stored host keys instead of a live ssh-keyscan, in a single pass.
+"""
+import os
+import re
+import hmac
+import base64
+import hashlib
+import argparse
+import contextlib
+
+import sshuk
+import keyindex
+from sshuk import info, warn, debug
+
+SAFE_HOST = re.compile(r'^[a-zA-Z0-9.\-_:]+$')
+# Options that ssh-unique-key manages itself and must not be copied into per-host config
+SKIP_OPTIONS = {'host', 'hostname', 'identityfile', 'identitiesonly', 'certificatefile'}
+
+def parse_known_hosts(path):
+    """Map hostname -> set of (key type, base64 key), plus the hashed (|1|salt|hash) entries.
+
+    Marker lines (@cert-authority, @revoked) and non-default ports are skipped.
+    """
+    hosts = {}
+    hashed = []
+    skipped = 0
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'): continue
+            parts = line.split()
+            if line.startswith('@') or len(parts) < 3:
+                skipped += 1
+                continue
+            if parts[0].startswith('|1|'):
+                try:
+                    salt, digest = (base64.b64decode(p) for p in parts[0][3:].split('|'))
+                except ValueError:
+                    skipped += 1
+                    continue
+                hashed.append((salt, digest, (parts[1], parts[2])))
+                continue
+            for name in parts[0].split(','):
+                if name.startswith('['):
+                    # [host]:port entries are only usable for the default port
+                    m = re.match(r'^\[([^\]]+)\](?::(\d+))?$', name)
+                    if not m or (m.group(2) and m.group(2) != '22'):
+                        skipped += 1
+                        continue
+                    name = m.group(1)
+                hosts.setdefault(name.lower(), set()).add((parts[1], parts[2]))
+    return hosts, hashed, skipped
+
+def resolve_hashed(hashed, names, hosts):
+    """Match HashKnownHosts entries against candidate names (HMAC-SHA1 of the name,
+    keyed with the entry's salt) and add the hits to hosts. Returns the unmatched count."""
+    unmatched = 0
+    for salt, digest, key in hashed:
+        for name in names:
+            if hmac.compare_digest(hmac.new(salt, name.encode(), hashlib.sha1).digest(), digest):
+                hosts.setdefault(name.lower(), set()).add(key)
+                break
+        else:
+            unmatched += 1
+    return unmatched
+
+def merge_host_keys(stored, imported):
+    """Union of two "type key" sets, or None if they hold different keys of the same type.
+
+    known_hosts often holds only some of a host's key types, so either side may be a
+    subset of what the host offers; only a conflicting key of one type is a mismatch.
+    """
+    by_type = {}
+    for entry in stored | imported:
+        ktype = entry.split()[0]
+        if ktype in by_type and by_type[ktype] != entry: return None
+        by_type[ktype] = entry
+    return set(by_type.values())
+
+def parse_ssh_config(path):
+    """List of (alias, options) for literal Host patterns; first value of an option wins."""
+    blocks = []
+    current = None
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'): continue
+            m = re.match(r'^(\S+?)\s*(?:=\s*|\s+)(.*)$', line)
+            if not m: continue
+            keyword, value = m.group(1), m.group(2).strip()
+            if keyword.lower() == 'host':
+                current = {}
+                for pattern in value.split():
+                    if any(c in pattern for c in '*?!'): continue
+                    blocks.append((pattern.lower(), current))
+            elif keyword.lower() == 'match':
+                current = None
+            elif current is not None and keyword.lower() not in current:
+                current[keyword.lower()] = (keyword, value)
+    return blocks
+
+def conflicting_types(keys):
+    """Key types present with more than one key, i.e. more than one machine."""
+    by_type = {}
+    for ktype, b64 in keys: by_type.setdefault(ktype, set()).add(b64)
+    return sorted(t for t, blobs in by_type.items() if len(blobs) > 1)
+
+def shared_options(alias_options, label):
+    """Options every alias of an identity sets to the same value; the rest are left out."""
+    options = {}
+    for k in set().union(*alias_options) - SKIP_OPTIONS:
+        values = {o[k][1] if k in o else None for o in alias_options}
+        if len(values) == 1 and None not in values: options[k] = alias_options[0][k]
+        else: warn(f"{label}: {alias_options[0].get(k, (k,))[0]} differs between aliases, not copied.")
+    return options
+
+def group_by_host_key(hosts):
+    """Group hostnames that share at least one host key; yields (names, keys)."""
+    by_key = {}
+    for name, keys in hosts.items():
+        for k in keys: by_key.setdefault(k, []).append(name)
+    seen = set()
+    for start in hosts:
+        if start in seen: continue
+        names, keys, todo = set(), set(), [start]
+        while todo:
+            name = todo.pop()
+            if name in seen: continue
+            seen.add(name)
+            names.add(name)
+            for k in hosts[name]:
+                if k in keys: continue
+                keys.add(k)
+                todo.extend(by_key[k])
+        yield names, keys
+
+def link_host(name, canonical, dry_run):
+    """by-host/<name> -> canonical, refusing to repoint an alias owned by another identity."""
+    link = os.path.join(sshuk.HOST_DIR, name)
+    if os.path.islink(link):
+        current = os.path.realpath(link)
+        if current == os.path.realpath(canonical): return False
+        warn(f"{name} already points to {os.path.basename(current)[:8]}, left unchanged.")
+        return False
+    if not dry_run: sshuk.force_symlink(canonical, link)
+    return True
+
+def link_key(b64, canonical, dry_run):
+    if not sshuk.by_key_link_ok(b64):
+        warn(f"Key path too long for {b64[:16]}..., skipping by-key link.")
+        return False
+    link = os.path.join(sshuk.KEY_DIR, b64)
+    if os.path.islink(link) and os.path.realpath(link) == os.path.realpath(canonical): return False
+    if not dry_run:
+        os.makedirs(os.path.dirname(link), mode=0o700, exist_ok=True)
+        sshuk.force_symlink(canonical, link)
+    return True
+
+def import_identity(names, keys, options, dry_run, stats):
+    # Prefer a DNS name over an address for the host column and log entries
+    primary = sorted(names, key=lambda n: (bool(re.match(r'^[0-9.:]+$', n)), n))[0]
+    lines = sorted(f"{primary} {ktype} {b64}" for ktype, b64 in keys)
+    uuid = sshuk.host_uuid_from_scan_lines(lines)
+    if not uuid:
+        warn(f"{primary}: no usable host key, skipped.")
+        stats['skipped'] += 1
+        return
+    # An identity ssh-new created from a full scan may be keyed on a type known_hosts lacks
+    for _, b64 in keys:
+        link = os.path.join(sshuk.KEY_DIR, b64)
+        if sshuk.by_key_link_ok(b64) and os.path.islink(link) and os.path.isdir(link):
+            uuid = os.path.basename(os.path.realpath(link))
+            break
+    else:
+        if not any(ktype == 'ssh-ed25519' for ktype, _ in keys):
+            # ssh-new derives the UUID from the ed25519 key when the host offers one
+            debug(f"{primary}: no ed25519 key in known_hosts, UUID may differ from ssh-new's.")
+            stats['no_ed25519'] += 1
+    canonical = os.path.join(sshuk.UUID_DIR, uuid)
+    debug(f"{primary}: UUID {uuid} ({len(names)} names, {len(keys)} keys)")
+
+    if os.path.isdir(canonical):
+        stored = []
+        kh_path = os.path.join(canonical, "known_host_keys")
+        if os.path.exists(kh_path):
+            with open(kh_path, 'r') as f: stored = [l for l in f.read().splitlines() if l.strip()]
+        stored_keys = set(sshuk.key_fields(stored))
+        merged = merge_host_keys(stored_keys, set(sshuk.key_fields(lines)))
+        if merged is None:
+            warn(f"{primary}: stored host keys for {uuid[:8]} conflict with known_hosts, skipped.")
+            stats['skipped'] += 1
+            return
+        if merged != stored_keys:
+            # Keep the stored host column (ssh-new's scan name) and add what known_hosts adds
+            host_col = stored[0].split()[0] if stored else primary
+            debug(f"{primary}: adding {len(merged - stored_keys)} host keys to {uuid[:8]}")
+            if not dry_run:
+                sshuk.atomic_write(kh_path, ''.join(f"{host_col} {k}\n" for k in sorted(merged)), 0o644)
+    else:
+        stats['created'] += 1
+        if not dry_run:
+            os.mkdir(canonical, 0o700)
+            sshuk.atomic_write(os.path.join(canonical, "known_host_keys"), '\n'.join(lines) + '\n', 0o644)
+            conf_path = os.path.join(canonical, "config")
+            sshuk.atomic_write(conf_path, ''.join(f"{keyword} {value}\n" for keyword, value in options.values()), 0o600)
+            sshuk.atomic_write(os.path.join(canonical, "trusted.conf"), sshuk.trusted_conf(conf_path), 0o600)
+            sshuk.log_event("create-identity", primary, f"UUID: {uuid} (import)")
+
+    stats['identities'] += 1
+    for name in sorted(names):
+        if not SAFE_HOST.match(name):
+            warn(f"Invalid host name '{name}', skipping by-host link.")
+            continue
+        if link_host(name, canonical, dry_run): stats['hosts'] += 1
+    for _, b64 in keys:
+        if link_key(b64, canonical, dry_run): stats['keys'] += 1
+
+def main():
+    parser = argparse.ArgumentParser(prog='ssh-import', description="Import hosts from known_hosts and ssh_config without scanning them")
+    parser.add_argument('--known-hosts', default=os.path.join(sshuk.HOME_DIR, ".ssh", "known_hosts"), help="known_hosts file to import (default: ~/.ssh/known_hosts)")
+    parser.add_argument('--config', default=os.path.join(sshuk.HOME_DIR, ".ssh", "config"), help="ssh_config whose Host blocks are imported (default: ~/.ssh/config)")
+    parser.add_argument('--no-config', action='store_true', help="Only import known_hosts")
+    parser.add_argument('-n', '--dry-run', action='store_true', help="Show what would be imported")
+    parser.add_argument('-V', '--verbose', action='store_true', help="Enable verbose output")
+    args = parser.parse_args()
+    sshuk.VERBOSE = args.verbose
+
+    if not os.path.exists(args.known_hosts): sshuk.err(f"known_hosts file not found: {args.known_hosts}")
+    hosts, hashed, skipped = parse_known_hosts(args.known_hosts)
+    if skipped: info(f"Skipped {skipped} marker or non-default-port entries.")
+
+    blocks = []
+    if not args.no_config and os.path.exists(args.config):
+        blocks = parse_ssh_config(args.config)
+    if hashed:
+        # Hashed names can only be recovered by trying the names we know about
+        candidates = {alias for alias, _ in blocks}
+        for _, options in blocks:
+            for opt in ('hostname', 'hostkeyalias'):
+                if opt in options: candidates.add(options[opt][1].lower())
+        unmatched = resolve_hashed(hashed, sorted(candidates), hosts)
+        info(f"Matched {len(hashed) - unmatched} of {len(hashed)} hashed entries against ssh_config hosts.")
+
+    # Host aliases from ssh_config join the identity of their HostName
+    aliases = {}
+    if blocks:
+        for alias, options in blocks:
+            target = options.get('hostname', (None, alias))[1].lower()
+            if target in hosts: aliases.setdefault(target, []).append((alias, options))
+            elif alias in hosts: aliases.setdefault(alias, []).append((alias, options))
+            else: debug(f"{alias}: no stored host keys, skipped.")
+
+    if not args.dry_run: sshuk.ensure_base_dirs()
+    stats = {'identities': 0, 'created': 0, 'hosts': 0, 'keys': 0, 'skipped': 0, 'no_ed25519': 0}
+    # Touches identities and links across the whole store, like backup/restore.
+    # A dry run writes nothing, not even the lock directory.
+    with contextlib.nullcontext() if args.dry_run else sshuk.store_lock(exclusive=True):
+        # A name with two keys of one type (a reused address) would join unrelated machines
+        for name in sorted(hosts):
+            types = conflicting_types(hosts[name])
+            if types:
+                warn(f"{name} has several {'/'.join(types)} host keys (reused name or address), skipped.")
+                stats['skipped'] += 1
+                del hosts[name]
+        for names, keys in group_by_host_key(hosts):
+            types = conflicting_types(keys)
+            if types:
+                warn(f"{', '.join(sorted(names))}: different {'/'.join(types)} host keys in one group, skipped.")
+                stats['skipped'] += 1
+                continue
+            alias_options = []
+            for name in sorted(names):
+                for alias, opts in aliases.get(name, []):
+                    names = names | {alias}
+                    alias_options.append(opts)
+            options = shared_options(alias_options, ', '.join(sorted(names))) if alias_options else {}
+            import_identity(names, keys, options, args.dry_run, stats)
+
+    prefix = "Would import" if args.dry_run else "Imported"
+    info(f"{prefix} {stats['identities']} identities ({stats['created']} new), "
+         f"{stats['hosts']} host links, {stats['keys']} key links; {stats['skipped']} skipped.")
+    if stats['no_ed25519']:
+        warn(f"{stats['no_ed25519']} identities have no ed25519 key; run ssh-keyscan -t ed25519 on them "
+             f"and add the result to known_hosts before importing to keep UUIDs in line with ssh-new.")
+    if not args.dry_run:
+        keyindex.update()
+        sshuk.log_event("import", "all", f"{stats['identities']} identities ({stats['created']} new) from {args.known_hosts}")
+
+if __name__ == '__main__':
+    main()
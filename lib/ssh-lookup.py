@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Find which identity, user or template owns a host or user key.
+
+Accepts OpenSSH SHA256 fingerprints, public key lines, raw key blobs or a whole
+log line such as "Accepted publickey for root ... ED25519 SHA256:...".
+"""
+import os
+import sys
+import argparse
+
+import sshuk
+import keyindex
+from sshuk import info, warn
+
+def describe(identity_uuid, user, aliases):
+    host = aliases[0] if aliases else identity_uuid[:8]
+    target = f"{user}@{host}" if user else host
+    return f"{target} ({identity_uuid[:8]})"
+
+def print_result(query, fp, results):
+    if not results:
+        print(f"{fp}  not found")
+        return
+    for r in results:
+        retired = " (retired)" if r['kind'].endswith('-retired') else ""
+        if r['kind'].startswith('template'):
+            keyfile = f" {r['keyfile']}" if r['keyfile'] else ""
+            print(f"{fp}  template {r['template']}{keyfile}{retired}")
+            for u in r.get('users', []):
+                print(f"    used by {describe(u['uuid'], u['user'], u['aliases'])}")
+        elif r['kind'] == 'host':
+            print(f"{fp}  host key of {describe(r['uuid'], '', r['aliases'])}")
+        else:
+            print(f"{fp}  user key of {describe(r['uuid'], r['user'], r['aliases'])}{retired}")
+
+def main():
+    parser = argparse.ArgumentParser(prog='ssh-lookup', description="Reverse lookup of host and user keys")
+    parser.add_argument('query', nargs='*', help="Fingerprint, public key, key blob or log line ('-' reads lines from stdin)")
+    parser.add_argument('--update', nargs='*', metavar='PATH', help="Rescan the given identity/template directories (all if none given)")
+    parser.add_argument('-V', '--verbose', action='store_true', help="Enable verbose output")
+    args = parser.parse_args()
+    sshuk.VERBOSE = args.verbose
+
+    if args.update is not None:
+        sources, records = keyindex.update(args.update or None)
+        info(f"Key index updated ({sources} sources rescanned, {records} records).")
+        if not args.query: return
+    if not args.query: parser.error("no query given")
+
+    if not os.path.exists(keyindex.INDEX_FILE):
+        warn("Key index missing, building it...")
+        keyindex.update()
+    index = keyindex.KeyIndex().load()
+
+    queries = [line for line in sys.stdin if line.strip()] if args.query == ['-'] else [' '.join(args.query)]
+    found = False
+    for query in queries:
+        fp, results = index.lookup(query)
+        print_result(query, fp, results)
+        found = found or bool(results)
+    sys.exit(0 if found else 1)
+
+if __name__ == '__main__':
+    main()
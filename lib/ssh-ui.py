@@ -35,6 +35,9 @@ except ImportError:
     pty = None
     termios = None
 
+import sshuk
+import keyindex
+
 from flask import Flask, session, request, render_template, abort, redirect, url_for, jsonify, send_from_directory, Response
 
 # Optional: Flask-SocketIO and Eventlet
@@ -52,14 +55,8 @@ PORT = 8080
 SECRET_KEY = secrets.token_hex(32)
 AUTH_TOKEN = secrets.token_urlsafe(32)
 
-# SSH Key Management Paths
-HOME_DIR = os.path.expanduser("~")
-BASE_DIR = os.path.join(HOME_DIR, ".ssh", "unique_keys")
-HOST_DIR = os.path.join(BASE_DIR, "by-host")
-UUID_DIR = os.path.join(BASE_DIR, "host-uuid")
-KEY_DIR = os.path.join(BASE_DIR, "by-key")
-SSH_TEMPLATE_DIR = os.path.join(BASE_DIR, "templates")
-LOG_FILE = os.path.join(BASE_DIR, "history.log")
+# SSH Key Management Paths (defined once in sshuk)
+from sshuk import HOME_DIR, BASE_DIR, HOST_DIR, UUID_DIR, KEY_DIR, SSH_TEMPLATE_DIR, LOG_FILE
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -86,6 +83,9 @@ if SOCKETIO_AVAILABLE:
     # CORS origins will be set at startup once port is known
     socketio = SocketIO(app, async_mode='gevent', cors_allowed_origins=[])
 
+# Fingerprint lookup index, reloaded when the index file changes
+key_index = keyindex.KeyIndex()
+
 # Global map for active PTYs: sid -> {fd, pid, ...}
 # Global map for active PTYs: term_id -> {fd, pid, sid, timer}
 active_terminals = {}
@@ -112,6 +112,7 @@ def robots():
     return Response("User-agent: *\nDisallow: /", mimetype='text/plain')
 def get_identities():
     identities = {}
+    key_index.refresh()
     if os.path.exists(UUID_DIR):
         for uuid in os.listdir(UUID_DIR):
             uuid_path = os.path.join(UUID_DIR, uuid)
@@ -128,18 +129,10 @@ def get_identities():
                         for line in f:
                             line = line.strip()
                             if not line or line.startswith('#'): continue
-                            parts = line.split()
-                            ktype = "unknown"
-                            key_content = ""
-                            for i, p in enumerate(parts):
-                                if p.startswith('ssh-') or p.startswith('ecdsa-'):
-                                    ktype = p
-                                    if i+1 < len(parts): key_content = parts[i+1]
-                                    break
+                            ktype, key_content = keyindex.parse_key_line(line) or ("unknown", "")
                             clean_type = ktype.replace('ssh-', '').replace('ecdsa-sha2-', '')
-                            import hashlib
-                            key_hash = hashlib.md5(line.encode('utf-8')).hexdigest()
-                            host_keys.append({'type': clean_type, 'full_type': ktype, 'key': key_content, 'id': key_hash})
+                            fp = key_index.fingerprint(key_content) or ''
+                            host_keys.append({'type': clean_type, 'full_type': ktype, 'key': key_content, 'id': fp, 'fingerprint': fp})
                 except Exception: pass
 
             # --- Users ---
@@ -215,10 +208,33 @@ def get_templates_list():
                     with open(issuer_file) as f: tmpl['issuer'] = f.read().strip()
                 if any(k.endswith('_sk') for k in keys):
                     tmpl['type'] = 'sk'
+                rotations = {}
+                for f in os.listdir(item_path):
+                    if f.startswith('.rotate-'):
+                        states = read_rotation_journal(os.path.join(item_path, f, 'journal'))
+                        counts = {}
+                        for entry in states.values():
+                            counts[entry['state']] = counts.get(entry['state'], 0) + 1
+                        rotations[f.replace('.rotate-', '')] = {'total': len(states), 'states': counts}
+                if rotations: tmpl['rotations'] = rotations
                 templates.append(tmpl)
     templates.sort(key=lambda x: x['name'])
     return templates
 
+def read_rotation_journal(journal_path):
+    """Latest state per identity from an ssh-template-rotate journal."""
+    states = {}
+    if os.path.exists(journal_path):
+        try:
+            with open(journal_path, 'r') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split('|')
+                    if len(parts) < 4: continue
+                    states[parts[1]] = {'ts': parts[0], 'identity': parts[1], 'host': parts[2],
+                                        'state': parts[3], 'details': parts[4] if len(parts) > 4 else ''}
+        except Exception: pass
+    return states
+
 def check_auth():
     """Check auth via HTTP-only cookie, or session fallback."""
     token = request.cookies.get('auth_token') or session.get('auth_token')
@@ -414,17 +430,21 @@ def delete_user():
     if not os.path.exists(user_path): return "Not found", 404
     
     try:
-        shutil.rmtree(user_path)
-        # Cleanup logic (collapsed for brevity, same as before)
-        uuid_dir = os.path.dirname(user_path)
-        if not any(os.path.isdir(os.path.join(uuid_dir, i)) for i in os.listdir(uuid_dir)):
-            shutil.rmtree(uuid_dir)
-            if os.path.exists(HOST_DIR):
-                for f in os.listdir(HOST_DIR):
-                    p = os.path.join(HOST_DIR, f)
-                    if os.path.islink(p) and os.path.basename(os.readlink(p)) == safe_uuid:
-                        os.unlink(p)
+        with sshuk.identity_lock(safe_uuid, wait=False):
+            shutil.rmtree(user_path)
+            # Cleanup logic (collapsed for brevity, same as before)
+            uuid_dir = os.path.dirname(user_path)
+            if not any(os.path.isdir(os.path.join(uuid_dir, i)) for i in os.listdir(uuid_dir)):
+                shutil.rmtree(uuid_dir)
+                if os.path.exists(HOST_DIR):
+                    for f in os.listdir(HOST_DIR):
+                        p = os.path.join(HOST_DIR, f)
+                        if os.path.islink(p) and os.path.basename(os.readlink(p)) == safe_uuid:
+                            os.unlink(p)
+            # After the cleanup, so host key and alias records of a removed identity go too
+            keyindex.update([user_path])
         return "Deleted", 200
+    except sshuk.LockBusy: return "Busy: another operation is using this identity", 409
     except Exception as e: return f"Error: {e}", 500
 
 @app.route('/api/templates', methods=['GET'])
@@ -444,12 +464,15 @@ def create_template():
     template_path = os.path.join(SSH_TEMPLATE_DIR, safe_name)
     if os.path.exists(template_path): return "Exists", 400
     try:
-        os.makedirs(template_path, mode=0o700)
-        if tmpl_type == 'standard':
-            key_path = os.path.join(template_path, "id_ed25519")
-            subprocess.run(['ssh-keygen', '-t', 'ed25519', '-f', key_path, '-N', '', '-C', f"template:{safe_name}"], check=True, capture_output=True)
+        with sshuk.template_lock(safe_name, wait=False):
+            os.makedirs(template_path, mode=0o700)
+            if tmpl_type == 'standard':
+                key_path = os.path.join(template_path, "id_ed25519")
+                subprocess.run(['ssh-keygen', '-t', 'ed25519', '-f', key_path, '-N', '', '-C', f"template:{safe_name}"], check=True, capture_output=True)
+                keyindex.update([template_path])
         # For sk/opk, template dir is created empty — key generation happens via terminal
         return "OK", 200
+    except sshuk.LockBusy: return "Busy: another operation is using this template", 409
     except Exception as e: return f"Error: {e}", 500
 
 @app.route('/api/templates/<name>', methods=['DELETE'])
@@ -459,10 +482,75 @@ def delete_template(name):
     template_path = os.path.join(SSH_TEMPLATE_DIR, safe_name)
     if not os.path.exists(template_path): return "Not found", 404
     try:
-        shutil.rmtree(template_path)
+        with sshuk.template_lock(safe_name, wait=False):
+            shutil.rmtree(template_path)
+            keyindex.update([template_path])
         return "Deleted", 200
+    except sshuk.LockBusy: return "Busy: another operation is using this template", 409
     except Exception as e: return f"Error: {e}", 500
 
+@app.route('/api/templates/<name>/rotation/<key_type>', methods=['GET'])
+def template_rotation_status(name, key_type):
+    if not check_auth(): return "Unauthorized", 401
+    safe_name = os.path.basename(name)
+    if key_type not in ('ed25519', 'ecdsa', 'rsa'): return "Invalid type", 400
+    rotate_dir = os.path.join(SSH_TEMPLATE_DIR, safe_name, f".rotate-{key_type}")
+    if not os.path.isdir(rotate_dir): return jsonify({'active': False, 'entries': []})
+    entries = sorted(read_rotation_journal(os.path.join(rotate_dir, 'journal')).values(), key=lambda e: e['identity'])
+    return jsonify({'active': True, 'entries': entries})
+
+def run_audit(host=None, clean=False):
+    """Run ssh-audit and group its raw records per identity."""
+    cmd = [os.path.join(BIN_DIR, "ssh-audit"), '--raw']
+    if clean: cmd.extend(['--clean', '--force'])
+    if host: cmd.append(host)
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    identities = {}
+    for line in result.stdout.splitlines():
+        parts = line.split('|')
+        if len(parts) < 6: continue
+        uuid, user, host_name, status, key, comment = parts[:6]
+        ident = identities.setdefault(f"{uuid}/{user}", {'uuid': uuid, 'user': user, 'host': host_name,
+                                                         'current_present': False, 'stale': [], 'managed': [], 'unknown': [], 'error': ''})
+        if status == 'current': ident['current_present'] = True
+        elif status in ('stale', 'managed', 'unknown'): ident[status].append({'key': key, 'comment': comment})
+        elif status == 'error': ident['error'] = comment
+    return result, list(identities.values())
+
+@app.route('/api/audit', methods=['GET'])
+def audit_keys():
+    if not check_auth(): return "Unauthorized", 401
+    host = request.args.get('host')
+    import re
+    if host and not re.match(r'^[a-zA-Z0-9.\-_]+$', host): return "Security block: Invalid host.", 400
+    try:
+        result, identities = run_audit(host)
+        if result.returncode != 0: return f"Failed: {result.stderr}", 500
+        return jsonify(identities)
+    except Exception as e: return f"Error: {e}", 500
+
+@app.route('/api/audit/clean', methods=['POST'])
+def audit_clean():
+    if not check_auth(): return "Unauthorized", 401
+    host = request.form.get('host')
+    import re
+    if host and not re.match(r'^[a-zA-Z0-9.\-_]+$', host): return "Security block: Invalid host.", 400
+    try:
+        result, identities = run_audit(host, clean=True)
+        if result.returncode != 0: return f"Failed: {result.stderr}", 500
+        return jsonify({'identities': identities, 'output': result.stderr})
+    except Exception as e: return f"Error: {e}", 500
+
+@app.route('/api/lookup', methods=['GET'])
+def lookup_key():
+    if not check_auth(): return "Unauthorized", 401
+    # A '+' in an unencoded ?fp=SHA256:... arrives as a space; fingerprints never contain spaces
+    query = (request.args.get('fp') or '').strip().replace(' ', '+') or request.args.get('key')
+    if not query: return "Missing fp", 400
+    if not os.path.exists(keyindex.INDEX_FILE): keyindex.update()
+    fp, results = key_index.refresh().lookup(query)
+    return jsonify({'fingerprint': fp, 'results': results})
+
 @app.route('/api/history', methods=['GET'])
 def get_history():
     if not check_auth(): return "Unauthorized", 401
@@ -620,9 +708,17 @@ if SOCKETIO_AVAILABLE:
             if not action or not name: return
             safe_name = "".join([c for c in name if c.isalnum() or c in ('-', '_')])
             if not safe_name: return
-            if action not in ('generate-sk', 'generate-opk', 'generate-keys'): return
-            ssh_template = os.path.join(BIN_DIR, "ssh-template")
-            shell_cmd = [ssh_template, action, safe_name]
+            if action == 'rotate':
+                key_type = data.get('key_type')
+                if key_type not in ('ed25519', 'ecdsa', 'rsa'): return
+                shell_cmd = [os.path.join(BIN_DIR, "ssh-template-rotate"), '-t', key_type]
+                if os.path.isdir(os.path.join(SSH_TEMPLATE_DIR, safe_name, f".rotate-{key_type}")):
+                    shell_cmd.append('--resume')
+                shell_cmd.append(safe_name)
+            else:
+                if action not in ('generate-sk', 'generate-opk', 'generate-keys'): return
+                ssh_template = os.path.join(BIN_DIR, "ssh-template")
+                shell_cmd = [ssh_template, action, safe_name]
 
         elif cmd_type == 'connect':
             # args: user, host
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Shared helpers for the Python side of ssh-unique-key (mirrors _ssh-unique-key.inc.sh)."""
+import os
+import sys
+import fcntl
+import hashlib
+import getpass
+import tempfile
+import time
+from contextlib import contextmanager
+
+# SSH Key Management Paths
+HOME_DIR = os.path.expanduser("~")
+BASE_DIR = os.path.join(HOME_DIR, ".ssh", "unique_keys")
+UUID_DIR = os.path.join(BASE_DIR, "host-uuid")
+KEY_DIR = os.path.join(BASE_DIR, "by-key")
+HOST_DIR = os.path.join(BASE_DIR, "by-host")
+SSH_TEMPLATE_DIR = os.path.join(BASE_DIR, "templates")
+CONF_TOP_DIR = os.path.join(BASE_DIR, "config-top.d")
+CONF_BOT_DIR = os.path.join(BASE_DIR, "config-bottom.d")
+LOG_FILE = os.path.join(BASE_DIR, "history.log")
+LOCK_DIR = os.path.join(BASE_DIR, ".locks")
+
+MAX_PATH = 4096
+MAX_NAME = 255
+
+VERBOSE = False
+
+def err(msg):
+    sys.stderr.write(f"\033[0;31m[ERROR]\033[0m {msg}\n")
+    sys.exit(1)
+
+def warn(msg):
+    sys.stderr.write(f"\033[0;33m[WARN]\033[0m {msg}\n")
+
+def info(msg):
+    sys.stderr.write(f"\033[0;32m[INFO]\033[0m {msg}\n")
+
+def debug(msg):
+    if VERBOSE: sys.stderr.write(f"\033[0;36m[DEBUG]\033[0m {msg}\n")
+
+def log_event(action, target, details):
+    ts = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    user = os.environ.get('USER') or getpass.getuser()
+    if not os.path.exists(LOG_FILE):
+        open(LOG_FILE, 'a').close()
+        os.chmod(LOG_FILE, 0o600)
+    with open(LOG_FILE, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.write(f"{ts}|{user}|{action}|{target}|{details}\n")
+    debug(f"Logged event: {action} {target}")
+
+def atomic_write(path, data, mode):
+    """Replace path via a temp file + rename, so readers never see a partial file."""
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + '.', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'w') as f: f.write(data)
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp): os.unlink(tmp)
+        raise
+
+# --- Locking (same lock files and hierarchy as _ssh-unique-key.inc.sh) ---
+class LockBusy(Exception):
+    pass
+
+@contextmanager
+def _flock(name, exclusive, wait):
+    os.makedirs(LOCK_DIR, mode=0o700, exist_ok=True)
+    with open(os.path.join(LOCK_DIR, name), 'a') as f:
+        op = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        try:
+            fcntl.flock(f, op | fcntl.LOCK_NB)
+        except BlockingIOError:
+            if not wait: raise LockBusy(name[:-5])
+            info(f"Waiting for lock {name[:-5]}...")
+            fcntl.flock(f, op)
+        debug(f"Acquired lock {name}")
+        yield
+
+@contextmanager
+def store_lock(exclusive=False, wait=True):
+    """Whole-store lock: exclusive for layout-wide operations, shared otherwise."""
+    with _flock("store.lock", exclusive, wait):
+        yield
+
+@contextmanager
+def identity_lock(uuid, wait=True):
+    with store_lock(wait=wait), _flock(f"host-{uuid.replace('/', '_')}.lock", True, wait):
+        yield
+
+@contextmanager
+def template_lock(name, exclusive=True, wait=True):
+    with store_lock(wait=wait), _flock(f"template-{name.replace('/', '_')}.lock", exclusive, wait):
+        yield
+
+@contextmanager
+def index_lock():
+    """Serializes rewrites of the key index; independent of the store hierarchy."""
+    with _flock("index.lock", True, True):
+        yield
+
+def ensure_base_dirs():
+    for d in (BASE_DIR, UUID_DIR, KEY_DIR, HOST_DIR, SSH_TEMPLATE_DIR, CONF_TOP_DIR, CONF_BOT_DIR):
+        os.makedirs(d, mode=0o700, exist_ok=True)
+    if not os.path.exists(LOG_FILE):
+        open(LOG_FILE, 'a').close()
+        os.chmod(LOG_FILE, 0o600)
+
+def host_uuid_from_scan_lines(lines):
+    """Same result as get_host_uuid_from_scan_data() for sorted "host type key" lines."""
+    best = ''
+    for line in lines:
+        fields = line.split()
+        key = fields[2] if len(fields) > 2 else ''
+        if 'ssh-ed25519' in line: best = key
+        if 'ecdsa' in line and not best: best = key
+        if 'ssh-rsa' in line and not best: best = key
+    if not best: return None
+    return hashlib.sha256(best.encode('utf-8')).hexdigest()
+
+def key_fields(lines):
+    """The "type key" part of known_host_keys lines, ignoring the host column."""
+    return sorted(' '.join(line.split()[1:3]) for line in lines if line.strip())
+
+def by_key_link_ok(b64):
+    """Mirror of ssh-new's path length checks for by-key/<base64> links."""
+    if len(os.path.join(KEY_DIR, b64)) > MAX_PATH: return False
+    return max(len(part) for part in b64.split('/')) <= MAX_NAME
+
+def trusted_conf(config_path):
+    return ("# Trusted by cryptographic path lookup (%K)\n"
+            "StrictHostKeyChecking no\n"
+            "UserKnownHostsFile /dev/null\n"
+            "LogLevel ERROR\n"
+            f"Include {config_path}\n")
+
+def force_symlink(target, link_path):
+    """ln -sf equivalent."""
+    if os.path.islink(link_path) or os.path.exists(link_path):
+        os.unlink(link_path)
+    os.symlink(target, link_path)
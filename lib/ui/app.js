@@ -101,14 +101,65 @@ function fetchTemplates() {
             data.forEach(t => {
                 var typeLabel = escapeHtml(t.type || 'standard');
                 if (t.issuer) typeLabel += ' <small>(' + escapeHtml(t.issuer) + ')</small>';
-                var actions = `<button class="btn-red" onclick="deleteTemplate('${escapeHtml(t.name)}')" style="padding:4px 8px;">Delete</button>`;
-                html += `<tr><td><strong>${escapeHtml(t.name)}</strong></td><td>${typeLabel}</td><td>${escapeHtml(t.keys.join(', '))}</td><td style="text-align:right;">${actions}</td></tr>`;
+                var actions = '';
+                var keysLabel = escapeHtml(t.keys.join(', '));
+                t.keys.forEach(k => {
+                    if (['ed25519', 'ecdsa', 'rsa'].indexOf(k) === -1) return;
+                    var rot = t.rotations && t.rotations[k];
+                    var label = rot ? 'Resume ' + k : 'Rotate ' + k;
+                    actions += `<button class="btn-blue" onclick="rotateTemplateKey('${escapeHtml(t.name)}', '${k}')" style="padding:4px 8px; margin-right:4px;">${label}</button>`;
+                });
+                if (t.rotations) {
+                    Object.keys(t.rotations).forEach(k => {
+                        keysLabel += `<div id="rotation-${escapeHtml(t.name)}-${escapeHtml(k)}">${rotationSummary(k, t.rotations[k].states, t.rotations[k].total)}</div>`;
+                    });
+                }
+                actions += `<button class="btn-red" onclick="deleteTemplate('${escapeHtml(t.name)}')" style="padding:4px 8px;">Delete</button>`;
+                html += `<tr><td><strong>${escapeHtml(t.name)}</strong></td><td>${typeLabel}</td><td>${keysLabel}</td><td style="text-align:right;">${actions}</td></tr>`;
             });
             html += '</tbody></table>';
             el.innerHTML = html;
+            data.forEach(t => Object.keys(t.rotations || {}).forEach(k => watchRotation(t.name, k)));
         });
 }
 
+function rotationSummary(keyType, states, total) {
+    var ok = (states.verified || 0) + (states.done || 0);
+    return `<small>Rotating ${escapeHtml(keyType)}: ${ok}/${total} verified` + (states.failed ? `, ${states.failed} failed` : '') + '</small>';
+}
+
+// Per-host progress of a running template rotation, polled until it finishes
+var rotationWatchers = {};
+function watchRotation(name, keyType) {
+    var id = 'rotation-' + name + '-' + keyType;
+    if (rotationWatchers[id]) return;
+    rotationWatchers[id] = true;
+    function poll() {
+        fetch('/api/templates/' + encodeURIComponent(name) + '/rotation/' + keyType)
+            .then(res => res.json())
+            .then(data => {
+                var el = document.getElementById(id);
+                if (!data.active) {
+                    delete rotationWatchers[id];
+                    if (el) fetchTemplates();
+                    return;
+                }
+                if (el) {
+                    var states = {};
+                    data.entries.forEach(e => { states[e.state] = (states[e.state] || 0) + 1; });
+                    el.innerHTML = rotationSummary(keyType, states, data.entries.length) + '<br>' + data.entries.map(e => {
+                        var who = escapeHtml(e.identity.split('/')[1] + '@' + (e.host !== '-' ? e.host : e.identity.split('/')[0].substring(0, 8)));
+                        var detail = e.details ? ' (' + escapeHtml(e.details) + ')' : '';
+                        return `<small>${who}: ${escapeHtml(e.state)}${detail}</small>`;
+                    }).join('<br>');
+                }
+                setTimeout(poll, 2000);
+            })
+            .catch(() => { delete rotationWatchers[id]; });
+    }
+    poll();
+}
+
 function handleTemplateCreate(event) {
     event.preventDefault();
     var name = document.getElementById('tmpl_create_name').value.trim();
@@ -143,6 +194,10 @@ function deleteTemplate(name) {
     fetch('/api/templates/' + name, { method: 'DELETE' }).then(r => fetchTemplates());
 }
 
+function rotateTemplateKey(name, keyType) {
+    openTerminal({ cmd: 'template', action: 'rotate', name: name, key_type: keyType });
+}
+
 // --- History ---
 function fetchHistory() {
     var el = document.getElementById('historyList');
@@ -178,7 +233,7 @@ function openInfoModal(uuid) {
     tbody.innerHTML = '';
     if (data.host_keys && data.host_keys.length > 0) {
         data.host_keys.forEach(k => {
-            tbody.innerHTML += `<tr><td>${escapeHtml(k.type)}</td><td style="font-family:monospace; word-break:break-all;">${escapeHtml(k.key)}</td></tr>`;
+            tbody.innerHTML += `<tr><td>${escapeHtml(k.type)}</td><td style="font-family:monospace; word-break:break-all;">${escapeHtml(k.key)}<br><small>${escapeHtml(k.fingerprint)}</small></td></tr>`;
         });
     } else { tbody.innerHTML = '<tr><td colspan="2" style="text-align:center;">No keys</td></tr>'; }
     document.getElementById('infoModal').style.display = 'block';
@@ -231,7 +286,7 @@ function openTerminal(cmdPayload) {
     } else if (cmdPayload.cmd === 'create') {
         title = "Create Identity: " + cmdPayload.user_host;
     } else if (cmdPayload.cmd === 'template') {
-        title = "Template: " + cmdPayload.action + " " + cmdPayload.name;
+        title = "Template: " + cmdPayload.action + " " + cmdPayload.name + (cmdPayload.key_type ? " (" + cmdPayload.key_type + ")" : "");
     }
     document.getElementById('terminal-title').innerText = title;
 